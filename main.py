@@ -1,13 +1,38 @@
 from AlgorithmImports import *
 from datetime import datetime, timedelta, timezone
-import uuid
+from typing import NamedTuple, Optional
+import heapq
+
+# Rule-string day numbers 1 (Monday) .. 7 (Sunday), indexed by day_of_week - 1
+_DOW = (
+    DayOfWeek.MONDAY,
+    DayOfWeek.TUESDAY,
+    DayOfWeek.WEDNESDAY,
+    DayOfWeek.THURSDAY,
+    DayOfWeek.FRIDAY,
+    DayOfWeek.SATURDAY,
+    DayOfWeek.SUNDAY
+)
+
+# Order events that can change our books; submit/update churn is everything else
+_RESOLVED_STATUSES = frozenset((OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.INVALID))
+
+class _Bracket(NamedTuple):
+    tp_id: int
+    sl_id: int
+    entry_timestamp: float
+    quantity: int
+    position_id: int
 
 class RuleDrivenExecution(QCAlgorithm):
     def initialize(self, rule_string: str = "4,0,2122,18003,326,336,8") -> None:
+        # Diagnostic debug lines are skipped, arguments and all, unless the "debug" algorithm parameter is set
+        self._debug_enabled: bool = self.get_parameter("debug", "false").lower() in ("1", "true", "yes")
         self.set_start_date(2024, 3, 29)
         self.set_end_date(2024, 6, 29)
         self.set_cash(100000)
         self._xauusd = self.add_cfd("XAUUSD", Resolution.MINUTE).symbol
+        self._security = self.securities[self._xauusd]
 
         try:
             parts = rule_string.split(',')
@@ -22,14 +47,38 @@ class RuleDrivenExecution(QCAlgorithm):
             self._order_expiry_hours = timedelta(hours=int(parts[6]))
         except Exception as e:
             raise ValueError(f"Failed to parse rule_string. Error: {e}")
+        self._trade_duration_s: float = self._trade_duration.total_seconds()
+        self._order_expiry_s: float = self._order_expiry_hours.total_seconds()
+        # Rule-derived price offsets (1 tick = $0.01), fixed for the whole backtest
+        self._tp_offset: float = self._take_profit_ticks / 100.0
+        self._sl_offset: float = self._stop_loss_ticks / 100.0
+        self._entry_offset: float = abs(self._entry_offset_ticks) / 100.0
+        self._is_buy_stop: bool = self._entry_offset_ticks > 0
+        # Positive offset: buy stop above the market; otherwise buy limit below it
+        self._order_fn = self.stop_market_order if self._is_buy_stop else self.limit_order
+        # Every cancel goes by order id, so resolve the transaction manager's method once
+        self._cancel_order = self.transactions.cancel_order
 
         # --- State Management Dictionaries ---
         # entry_order_id -> expiry_timestamp
         self._pending_orders: Dict[int, float] = {}
-        # entry_order_id -> { tp_id, sl_id, entry_timestamp, quantity, position_id }
-        self._bracket_orders: Dict[int, Dict[str, Any]] = {}
+        # entry_order_id -> _Bracket(tp_id, sl_id, entry_timestamp, quantity, position_id)
+        self._bracket_orders: Dict[int, _Bracket] = {}
         # order_id -> position_id (for sl, tp, and time-exit market orders)
-        self._order_to_position_id: Dict[int, str] = {}
+        self._order_to_position_id: Dict[int, int] = {}
+        # Last position_id handed out; ids are unique within a backtest
+        self._pos_counter = 0
+        # entry_order_id -> submitted quantity, for entries still awaiting a fill
+        # (tags are for logs only, never parsed)
+        self._entry_quantities: Dict[int, int] = {}
+        # tp_id / sl_id -> entry_order_id (reverse index into _bracket_orders)
+        self._child_to_entry: Dict[int, int] = {}
+
+        # --- Expiry Schedules (min-heaps, so on_data only touches what is due) ---
+        # (expiry_timestamp, entry_order_id); stale once the entry is filled or canceled
+        self._pending_heap: List[Tuple[float, int]] = []
+        # (time_exit_timestamp, entry_order_id); stale once the bracket is closed by TP/SL
+        self._exit_heap: List[Tuple[float, int]] = []
 
         day_of_week_enum = self._convert_int_to_day_of_week(day_of_week)
         self.schedule.on(
@@ -43,53 +92,48 @@ class RuleDrivenExecution(QCAlgorithm):
             self.error("Stop-loss and take-profit ticks must be positive values.")
             return
 
-        price = self.securities[self._xauusd].price
+        price = self._security.price
         quantity = 10
-        self.debug(f"--- EXECUTING RULE on {self.utc_time.strftime('%Y-%m-%d %H:%M')} (UTC) ---")
-
-        is_buy_stop = self._entry_offset_ticks > 0
-        entry_price_offset = abs(self._entry_offset_ticks) / 100.0
+        if self._debug_enabled:
+            self.debug(f"--- EXECUTING RULE on {self.utc_time.strftime('%Y-%m-%d %H:%M')} (UTC) ---")
 
         # Generate a unique position-group ID for this logical trade cycle
-        position_id = str(uuid.uuid4())
+        self._pos_counter += 1
+        position_id = self._pos_counter
 
-        if is_buy_stop:
-            entry_price = price + entry_price_offset
-            tag = f"Entry Order | pos_id={position_id}"
-            ticket = self.stop_market_order(self._xauusd, quantity, entry_price, tag=tag)
-        else:
-            entry_price = price - entry_price_offset
-            tag = f"Entry Order | pos_id={position_id}"
-            ticket = self.limit_order(self._xauusd, quantity, entry_price, tag=tag)
+        entry_price = price + self._entry_offset if self._is_buy_stop else price - self._entry_offset
+        tag = f"Entry Order | pos_id={position_id}"
+        ticket = self._order_fn(self._xauusd, quantity, entry_price, tag=tag)
 
         if ticket.status != OrderStatus.INVALID:
-            expiry_time = self.utc_time + self._order_expiry_hours
-            self._pending_orders[ticket.order_id] = expiry_time.timestamp()
+            expiry_timestamp = self.utc_time.timestamp() + self._order_expiry_s
+            self._pending_orders[ticket.order_id] = expiry_timestamp
+            heapq.heappush(self._pending_heap, (expiry_timestamp, ticket.order_id))
             # Track the position ID for this entry order
             self._order_to_position_id[ticket.order_id] = position_id
-            self.debug(f"Entry order {ticket.order_id} submitted. Expires if not filled by {expiry_time.strftime('%Y-%m-%d %H:%M')}. pos_id={position_id}")
+            self._entry_quantities[ticket.order_id] = quantity
+            # Records validate_logs.py parses are logged unconditionally; only diagnostics are gated
+            self.log(f"Entry order {ticket.order_id} submitted. Expires if not filled by {(self.utc_time + self._order_expiry_hours).strftime('%Y-%m-%d %H:%M')}. pos_id={position_id}")
 
     def on_order_event(self, order_event: OrderEvent) -> None:
-        order_id = order_event.order_id
-        ticket = self.transactions.get_order_ticket(order_id)
-        if not ticket:
+        # Only fills and terminal states change our books; skip submit/update churn early
+        if order_event.status not in _RESOLVED_STATUSES:
             return
 
-        # Check for attached position id in tag or lookup
-        position_id = None
-        if ticket.tag and "pos_id=" in ticket.tag:
-            position_id = ticket.tag.split("pos_id=")[-1].strip()
-        elif order_id in self._order_to_position_id:
-            position_id = self._order_to_position_id[order_id]
+        order_id = order_event.order_id
+        # Time-limit closes and any order we didn't place never touch the books below
+        if order_id not in self._pending_orders and order_id not in self._child_to_entry:
+            return
+        position_id = self._order_to_position_id.get(order_id)
 
         # If a new Entry Order is filled, create the SL/TP bracket
-        if order_event.status == OrderStatus.FILLED and ticket.tag.startswith("Entry Order"):
+        quantity = self._entry_quantities.get(order_id)
+        if order_event.status == OrderStatus.FILLED and quantity is not None:
             fill_price = order_event.fill_price
-            quantity = ticket.quantity
             direction = 1 if quantity > 0 else -1
 
-            tp_price = fill_price + direction * (self._take_profit_ticks / 100.0)
-            sl_price = fill_price - direction * (self._stop_loss_ticks / 100.0)
+            tp_price = fill_price + direction * self._tp_offset
+            sl_price = fill_price - direction * self._sl_offset
 
             tp_tag = f"TakeProfit | pos_id={position_id}"
             sl_tag = f"StopLoss | pos_id={position_id}"
@@ -98,87 +142,96 @@ class RuleDrivenExecution(QCAlgorithm):
             # Track the position ID for these orders
             self._order_to_position_id[tp_ticket.order_id] = position_id
             self._order_to_position_id[sl_ticket.order_id] = position_id
+            # Let a leg's order event resolve its parent entry without scanning every bracket
+            self._child_to_entry[tp_ticket.order_id] = order_id
+            self._child_to_entry[sl_ticket.order_id] = order_id
 
             # Store all info needed to manage this independent trade
-            self._bracket_orders[order_id] = {
-                'tp_id': tp_ticket.order_id,
-                'sl_id': sl_ticket.order_id,
-                'entry_timestamp': order_event.utc_time.timestamp(),
-                'quantity': quantity,
-                'position_id': position_id
-            }
-            self.debug(f"ENTRY EXECUTED: OrderID {order_id} filled at ${fill_price:.2f}. TP: {tp_price:.2f}, SL: {sl_price:.2f}, pos_id={position_id}")
+            entry_timestamp = order_event.utc_time.timestamp()
+            self._bracket_orders[order_id] = _Bracket(
+                tp_id=tp_ticket.order_id,
+                sl_id=sl_ticket.order_id,
+                entry_timestamp=entry_timestamp,
+                quantity=quantity,
+                position_id=position_id
+            )
+            heapq.heappush(self._exit_heap, (entry_timestamp + self._trade_duration_s, order_id))
+            # Announce the leg ids so log validation can attribute each exit to its entry
+            self.log(f"CHILD ORDERS: Entry {order_id} TP {tp_ticket.order_id} SL {sl_ticket.order_id}")
+            self.log(f"ENTRY EXECUTED: OrderID {order_id} filled at ${fill_price:.2f}. TP: {tp_price:.2f}, SL: {sl_price:.2f}, pos_id={position_id}")
 
         # If a TP/SL order for any trade fills, find its parent entry and clean up
-        entry_id_to_remove = None
-        for entry_id, ids in list(self._bracket_orders.items()):
-            if order_id in [ids['tp_id'], ids['sl_id']]:
-                if order_event.status == OrderStatus.FILLED:
-                    other_id = ids['sl_id'] if order_id == ids['tp_id'] else ids['tp_id']
-                    self.transactions.cancel_order(other_id, f"Opposite bracket leg filled | pos_id={ids['position_id']}")
-                    self.debug(f"EXIT EXECUTED: OrderID {order_id} ({ticket.tag}) filled at ${order_event.fill_price:.2f} | pos_id={ids['position_id']}")
-                    entry_id_to_remove = entry_id
-                break
-
-        if entry_id_to_remove is not None:
-            # Clean up the mapping for the child orders
-            ids = self._bracket_orders[entry_id_to_remove]
-            for oid in [entry_id_to_remove, ids['tp_id'], ids['sl_id']]:
-                if oid in self._order_to_position_id:
-                    del self._order_to_position_id[oid]
-            del self._bracket_orders[entry_id_to_remove]
+        entry_id = self._child_to_entry.get(order_id)
+        if entry_id is not None and order_event.status == OrderStatus.FILLED:
+            bracket = self._release_bracket(entry_id)
+            if order_id == bracket.tp_id:
+                leg, other_id = "TakeProfit", bracket.sl_id
+            else:
+                leg, other_id = "StopLoss", bracket.tp_id
+            self._cancel_order(other_id, f"Opposite bracket leg filled | pos_id={bracket.position_id}")
+            self.log(f"EXIT EXECUTED: OrderID {order_id} ({leg}) filled at ${order_event.fill_price:.2f} | pos_id={bracket.position_id}")
 
         # Clean up the pending order list if the entry order is resolved
-        if order_id in self._pending_orders:
-            if order_event.status in [OrderStatus.FILLED, OrderStatus.CANCELED, OrderStatus.INVALID]:
-                del self._pending_orders[order_id]
-                if order_id in self._order_to_position_id and order_id not in self._bracket_orders:
-                    del self._order_to_position_id[order_id]
+        if self._pending_orders.pop(order_id, None) is not None:
+            del self._entry_quantities[order_id]
+            if order_event.status == OrderStatus.CANCELED:
+                # Entries are only ever canceled by the expiry check in on_data
+                self.log(f"CANCELED: Entry Order {order_id} expired without being filled.")
+            if order_id not in self._bracket_orders:
+                self._order_to_position_id.pop(order_id, None)
 
     def on_data(self, slice: Slice) -> None:
+        # Most bars fall between trades, with nothing pending and nothing open
+        if not self._pending_orders and not self._bracket_orders:
+            return
+
+        now_ts = self.utc_time.timestamp()
+
         # 1. Cancel expired pending entry orders
-        for order_id, expiry_timestamp in list(self._pending_orders.items()):
-            if self.utc_time.timestamp() >= expiry_timestamp:
-                position_id = self._order_to_position_id.get(order_id, "N/A")
-                self.transactions.cancel_order(order_id, f"Order expired before fill | pos_id={position_id}")
+        pending_heap = self._pending_heap
+        while pending_heap and pending_heap[0][0] <= now_ts:
+            expiry_timestamp, order_id = heapq.heappop(pending_heap)
+            if self._pending_orders.get(order_id) != expiry_timestamp:
+                continue  # Entry already filled or canceled
+            position_id = self._order_to_position_id.get(order_id, "N/A")
+            self._cancel_order(order_id, f"Order expired before fill | pos_id={position_id}")
 
         # 2. Check for time-based exits for all open positions
-        for entry_id, details in list(self._bracket_orders.items()):
-            entry_timestamp = details['entry_timestamp']
-            time_exit_timestamp = entry_timestamp + self._trade_duration.total_seconds()
-            if self.utc_time.timestamp() >= time_exit_timestamp:
-                position_id = details['position_id']
-                self.debug(f"EXIT TRIGGERED (TIME LIMIT): Trade from Entry Order {entry_id} has expired. pos_id={position_id}")
-
-                # Cancel the outstanding SL and TP orders
-                self.transactions.cancel_order(details['tp_id'], f"Time limit exit | pos_id={position_id}")
-                self.transactions.cancel_order(details['sl_id'], f"Time limit exit | pos_id={position_id}")
-
-                # Liquidate only the specific trade's quantity, and mark with the same position id
-                quantity_to_close = details['quantity']
-                tag = f"Time Limit Exit | pos_id={position_id}"
-                close_ticket = self.market_order(self._xauusd, -quantity_to_close, tag=tag)
-                self._order_to_position_id[close_ticket.order_id] = position_id
-
+        exit_heap = self._exit_heap
+        while exit_heap and exit_heap[0][0] <= now_ts:
+            _, entry_id = heapq.heappop(exit_heap)
+            details = self._release_bracket(entry_id)
+            if details is None:
+                continue  # Bracket already closed by its TP or SL
+            position_id = details.position_id
+            self.log(f"EXIT TRIGGERED (TIME LIMIT): Trade from Entry Order {entry_id} has expired. pos_id={position_id}")
+
+            # Liquidate only the specific trade's quantity, and mark with the same position id.
+            # The close goes out first so the position is flattened while the leg cancels are in flight.
+            quantity_to_close = details.quantity
+            tag = f"Time Limit Exit | pos_id={position_id}"
+            close_ticket = self.market_order(self._xauusd, -quantity_to_close, tag=tag)
+            self._order_to_position_id[close_ticket.order_id] = position_id
+
+            # Cancel the outstanding SL and TP orders. These are cancelled by id rather than with
+            # cancel_open_orders, which would also hit other overlapping trades' legs and entries.
+            self._cancel_order(details.tp_id, f"Time limit exit | pos_id={position_id}")
+            self._cancel_order(details.sl_id, f"Time limit exit | pos_id={position_id}")
+
+            if self._debug_enabled:
                 self.debug(f"Closing {-quantity_to_close} units for timed-out trade {entry_id}. pos_id={position_id}")
 
-                # Remove the entry from our tracker
-                for oid in [entry_id, details['tp_id'], details['sl_id']]:
-                    if oid in self._order_to_position_id:
-                        del self._order_to_position_id[oid]
-                del self._bracket_orders[entry_id]
+    def _release_bracket(self, entry_id: int) -> Optional[_Bracket]:
+        # Pop the trade and its id mappings in one go; returns None if it was already closed
+        bracket = self._bracket_orders.pop(entry_id, None)
+        if bracket is not None:
+            for oid in (entry_id, bracket.tp_id, bracket.sl_id):
+                self._order_to_position_id.pop(oid, None)
+            del self._child_to_entry[bracket.tp_id]
+            del self._child_to_entry[bracket.sl_id]
+        return bracket
 
     def _convert_int_to_day_of_week(self, day_of_week: int) -> DayOfWeek:
-        mapping = {
-            1: DayOfWeek.MONDAY,
-            2: DayOfWeek.TUESDAY,
-            3: DayOfWeek.WEDNESDAY,
-            4: DayOfWeek.THURSDAY,
-            5: DayOfWeek.FRIDAY,
-            6: DayOfWeek.SATURDAY,
-            7: DayOfWeek.SUNDAY
-        }
-        day = mapping.get(day_of_week)
-        if day is None:
+        if not 1 <= day_of_week <= 7:
             raise ValueError(f"Invalid day_of_week '{day_of_week}'. Please use a value from 1 (Monday) to 7 (Sunday).")
-        return day
+        return _DOW[day_of_week - 1]
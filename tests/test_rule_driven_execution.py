@@ -0,0 +1,194 @@
+import os
+import sys
+import unittest
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Tuple
+from unittest.mock import MagicMock
+
+# Add the parent directory to the path so we can import the main module
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Mock the AlgorithmImports module
+class MockDayOfWeek:
+    MONDAY = "Monday"
+    TUESDAY = "Tuesday"
+    WEDNESDAY = "Wednesday"
+    THURSDAY = "Thursday"
+    FRIDAY = "Friday"
+    SATURDAY = "Saturday"
+    SUNDAY = "Sunday"
+
+class MockOrderStatus:
+    SUBMITTED = "Submitted"
+    FILLED = "Filled"
+    CANCELED = "Canceled"
+    INVALID = "Invalid"
+
+class MockResolution:
+    MINUTE = "Minute"
+
+# Create mock for the main module
+sys.modules['AlgorithmImports'] = MagicMock()
+sys.modules['AlgorithmImports'].DayOfWeek = MockDayOfWeek
+sys.modules['AlgorithmImports'].OrderStatus = MockOrderStatus
+sys.modules['AlgorithmImports'].Resolution = MockResolution
+sys.modules['AlgorithmImports'].QCAlgorithm = MagicMock
+sys.modules['AlgorithmImports'].Slice = MagicMock
+sys.modules['AlgorithmImports'].OrderEvent = MagicMock
+sys.modules['AlgorithmImports'].TimeZones = MagicMock()
+sys.modules['AlgorithmImports'].Dict = Dict
+sys.modules['AlgorithmImports'].List = List
+sys.modules['AlgorithmImports'].Tuple = Tuple
+
+# Now import the main module, dropping any copy imported against another test's mocks
+sys.modules.pop('main', None)
+from main import RuleDrivenExecution
+
+class RecordingDict(dict):
+    """A dict that records get/pop calls, to check which books a code path reads or changes."""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.lookups = []
+
+    def get(self, key, default=None):
+        self.lookups.append(('get', key))
+        return super().get(key, default)
+
+    def pop(self, key, *default):
+        self.lookups.append(('pop', key))
+        return super().pop(key, *default)
+
+class TestRuleDrivenExecution(unittest.TestCase):
+    """
+    Tests for the order books RuleDrivenExecution keeps: entry expiry, bracket legs and
+    time-limit exits. Orders are mocked tickets with ids handed out in submission order.
+    """
+
+    START = datetime(2024, 4, 4, tzinfo=timezone.utc)
+    QUANTITY = 10
+    ORDER_EXPIRY = timedelta(hours=8)
+    TRADE_DURATION = timedelta(hours=336)
+
+    def setUp(self):
+        """Set up the test environment before each test."""
+        self.algorithm = RuleDrivenExecution()
+        self.calls = []
+        self.next_order_id = 0
+
+        # Mock the API methods and properties provided by the QCAlgorithm base class
+        self.algorithm.get_parameter = MagicMock(return_value="false")
+        self.algorithm.set_start_date = MagicMock()
+        self.algorithm.set_end_date = MagicMock()
+        self.algorithm.set_cash = MagicMock()
+        self.algorithm.add_cfd = MagicMock()
+        self.algorithm.securities = MagicMock()
+        self.algorithm.schedule = MagicMock()
+        self.algorithm.date_rules = MagicMock()
+        self.algorithm.time_rules = MagicMock()
+        self.algorithm.log = MagicMock()
+        self.algorithm.debug = MagicMock()
+        self.algorithm.stop_market_order = MagicMock(side_effect=self.place_order)
+        self.algorithm.limit_order = MagicMock(side_effect=self.place_order)
+        self.algorithm.market_order = MagicMock(
+            side_effect=lambda symbol, quantity, tag: self.place_order(symbol, quantity, None, tag=tag))
+        self.algorithm.transactions = MagicMock()
+        self.algorithm.transactions.cancel_order.side_effect = (
+            lambda order_id, tag: self.calls.append(('cancel', order_id, tag)))
+
+        # Mock the return value for add_cfd to provide a mock symbol
+        self.mock_symbol = MagicMock()
+        self.algorithm.add_cfd.return_value.symbol = self.mock_symbol
+        self.algorithm.securities.__getitem__.return_value.price = 2000.0
+
+        # Initialize the algorithm with default parameters.
+        self.algorithm.initialize()
+        self.algorithm.utc_time = self.START
+
+    def place_order(self, symbol, quantity, price, tag):
+        """Returns a submitted ticket with the next order id and records the order."""
+        self.next_order_id += 1
+        self.calls.append(('order', self.next_order_id, quantity, tag))
+        return MagicMock(order_id=self.next_order_id, status=MockOrderStatus.SUBMITTED)
+
+    def order_event(self, order_id, status, fill_price=0.0):
+        return MagicMock(order_id=order_id, status=status, fill_price=fill_price,
+                         utc_time=self.algorithm.utc_time)
+
+    def advance(self, delta):
+        """Moves the clock forward and runs on_data."""
+        self.algorithm.utc_time += delta
+        self.algorithm.on_data(MagicMock())
+
+    def open_trade(self):
+        """Submits and fills an entry; returns (entry_id, tp_id, sl_id)."""
+        self.algorithm.execute_rule()
+        self.advance(timedelta(hours=1))
+        self.algorithm.on_order_event(self.order_event(1, MockOrderStatus.FILLED, fill_price=2003.26))
+        self.calls.clear()
+        bracket = self.algorithm._bracket_orders[1]
+        return 1, bracket.tp_id, bracket.sl_id
+
+    def test_expired_entry_is_canceled_once(self):
+        """An unfilled entry is canceled once when it expires, however many bars follow."""
+        self.algorithm.execute_rule()
+        self.calls.clear()
+        self.advance(self.ORDER_EXPIRY - timedelta(minutes=1))
+        self.assertEqual(self.calls, [])
+
+        self.advance(timedelta(minutes=1))
+        self.advance(timedelta(minutes=1))
+        self.assertEqual(self.calls, [('cancel', 1, "Order expired before fill | pos_id=1")])
+
+        self.algorithm.on_order_event(self.order_event(1, MockOrderStatus.CANCELED))
+        self.algorithm.log.assert_called_with("CANCELED: Entry Order 1 expired without being filled.")
+        self.assertEqual(self.algorithm._pending_orders, {})
+        self.assertEqual(self.algorithm._entry_quantities, {})
+        self.assertEqual(self.algorithm._order_to_position_id, {})
+
+    def test_take_profit_fill_cancels_stop_loss(self):
+        """A TP fill cancels the SL and releases the bracket and both leg mappings."""
+        entry_id, tp_id, sl_id = self.open_trade()
+        self.assertEqual(self.algorithm._child_to_entry, {tp_id: entry_id, sl_id: entry_id})
+
+        self.algorithm.on_order_event(self.order_event(tp_id, MockOrderStatus.FILLED, fill_price=2183.29))
+        self.assertEqual(self.calls, [('cancel', sl_id, "Opposite bracket leg filled | pos_id=1")])
+        self.assertEqual(self.algorithm._bracket_orders, {})
+        self.assertEqual(self.algorithm._child_to_entry, {})
+        self.assertEqual(self.algorithm._order_to_position_id, {})
+
+    def test_time_limit_exit_closes_before_canceling_legs(self):
+        """At the time limit the trade's quantity is closed first, then both legs are canceled."""
+        entry_id, tp_id, sl_id = self.open_trade()
+        self.advance(self.TRADE_DURATION - timedelta(minutes=1))
+        self.assertEqual(self.calls, [])
+
+        self.advance(timedelta(minutes=1))
+        close_id = self.next_order_id
+        self.assertEqual(self.calls, [
+            ('order', close_id, -self.QUANTITY, "Time Limit Exit | pos_id=1"),
+            ('cancel', tp_id, "Time limit exit | pos_id=1"),
+            ('cancel', sl_id, "Time limit exit | pos_id=1"),
+        ])
+        self.assertEqual(self.algorithm._bracket_orders, {})
+        self.assertEqual(self.algorithm._child_to_entry, {})
+        self.assertEqual(self.algorithm._order_to_position_id, {close_id: 1})
+
+    def test_untracked_order_event_is_ignored(self):
+        """An event for an order we never placed returns after the membership checks, touching no book."""
+        self.open_trade()
+        books = {}
+        for name in ('_pending_orders', '_bracket_orders', '_order_to_position_id',
+                     '_entry_quantities', '_child_to_entry'):
+            books[name] = RecordingDict(getattr(self.algorithm, name))
+            setattr(self.algorithm, name, books[name])
+        self.algorithm.log.reset_mock()
+
+        self.algorithm.on_order_event(self.order_event(99, MockOrderStatus.FILLED, fill_price=2000.0))
+        self.assertEqual(self.calls, [])
+        self.algorithm.log.assert_not_called()
+        for name, book in books.items():
+            self.assertEqual(book.lookups, [], name)
+
+if __name__ == '__main__':
+    unittest.main()
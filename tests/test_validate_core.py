@@ -0,0 +1,81 @@
+import os
+import sys
+import unittest
+
+import numpy as np
+
+# Add the parent directory to the path so we can import the validator modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validate_core import bracket_prices, check_trades
+
+TAKE_PROFIT_PRICE = 180.03
+STOP_LOSS_PRICE = 21.22
+TRADE_DURATION_S = 336 * 3600
+
+class TestBracketPrices(unittest.TestCase):
+    """Tests for the expected take-profit / stop-loss prices."""
+
+    def test_long_and_short(self):
+        self.assertEqual(bracket_prices(2000.0, 1, 10.0, 5.0), (2010.0, 1995.0))
+        self.assertEqual(bracket_prices(2000.0, -1, 10.0, 5.0), (1990.0, 2005.0))
+
+    def test_arrays(self):
+        tp, sl = bracket_prices(np.array([2000.0, 2000.0]), np.array([1.0, -1.0]), 10.0, 5.0)
+        self.assertEqual(tp.tolist(), [2010.0, 1990.0])
+        self.assertEqual(sl.tolist(), [1995.0, 2005.0])
+
+class TestCheckTrades(unittest.TestCase):
+    """Tests for the vectorized closed-trade checks."""
+
+    def check(self, *trades):
+        """trades are (entry_price, exit_price, is_win, duration_s, expected_duration_s) rows."""
+        entry_price, exit_price, is_win, duration_s, expected_duration_s = (np.array(column) for column in zip(*trades))
+        return check_trades(entry_price.astype(float), exit_price.astype(float), is_win.astype(bool),
+                            duration_s.astype(np.int64), expected_duration_s.astype(np.int64),
+                            TAKE_PROFIT_PRICE, STOP_LOSS_PRICE, TRADE_DURATION_S)
+
+    def test_winner_at_take_profit_is_valid(self):
+        checks = self.check((2000.0, 2180.03, True, 3600, 3600))
+        self.assertTrue(checks.valid[0])
+        self.assertTrue(checks.is_long[0])
+        self.assertAlmostEqual(checks.expected_tp_price[0], 2180.03)
+
+    def test_winner_away_from_take_profit(self):
+        # Tolerance is 5% of the take-profit price: ~109 here
+        checks = self.check((2000.0, 2050.0, True, 3600, 3600))
+        self.assertTrue(checks.tp_bad[0])
+        self.assertFalse(checks.valid[0])
+
+    def test_short_winner(self):
+        checks = self.check((2000.0, 1819.97, True, 3600, 3600))
+        self.assertFalse(checks.is_long[0])
+        self.assertAlmostEqual(checks.expected_tp_price[0], 1819.97)
+        self.assertTrue(checks.valid[0])
+
+    def test_loser_at_stop_loss_is_valid(self):
+        checks = self.check((2000.0, 1978.78, False, 3600, 3600))
+        self.assertFalse(checks.hit_time_limit[0])
+        self.assertFalse(checks.sl_bad[0])
+        self.assertTrue(checks.valid[0])
+
+    def test_loser_away_from_stop_loss(self):
+        # Tolerance is 3% of the stop-loss price: ~59 here
+        checks = self.check((2000.0, 1900.0, False, 3600, 3600))
+        self.assertTrue(checks.sl_bad[0])
+        self.assertFalse(checks.valid[0])
+
+    def test_loser_at_time_limit_skips_stop_loss_check(self):
+        checks = self.check((2000.0, 1900.0, False, TRADE_DURATION_S, TRADE_DURATION_S))
+        self.assertTrue(checks.hit_time_limit[0])
+        self.assertFalse(checks.sl_bad[0])
+        self.assertTrue(checks.valid[0])
+
+    def test_duration_mismatch_over_a_minute(self):
+        checks = self.check((2000.0, 2180.03, True, 3600, 3660),
+                            (2000.0, 2180.03, True, 3600, 3661))
+        self.assertEqual(checks.duration_bad.tolist(), [False, True])
+        self.assertEqual(checks.valid.tolist(), [True, False])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+# Add the parent directory to the path so we can import the validator modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from validate_logs import validate_qc_logs
+
+RULE_STRING = "4,0,2122,18003,326,336,8"
+
+# Two overlapping trades: entry 4 is filled before entry 1 has exited, and closes first
+OVERLAPPING_LOG = """\
+2024-04-04 00:00:00 Entry order 1 submitted. Expires if not filled by 2024-04-04 08:00:00.
+2024-04-04 01:30:00 ENTRY EXECUTED: OrderID 1 filled at $2000.00. TP: 2180.03, SL: 1978.78 | pos_id=1
+2024-04-04 01:30:00 CHILD ORDERS: Entry 1 TP 2 SL 3
+2024-04-04 02:00:00 Launching analysis for noise ENTRY EXECUTED
+2024-04-11 00:00:00 Entry order 4 submitted. Expires if not filled by 2024-04-11 08:00:00.
+2024-04-11 01:15:00 ENTRY EXECUTED: OrderID 4 filled at $1900.00. TP: 2080.03, SL: 1878.78 | pos_id=2
+2024-04-11 01:15:00 CHILD ORDERS: Entry 4 TP 5 SL 6
+2024-04-12 09:00:00 EXIT EXECUTED: OrderID 5 (TakeProfit) filled at $2080.03 | pos_id=2
+2024-04-13 10:00:00 EXIT EXECUTED: OrderID 3 (StopLoss) filled at $1978.78 | pos_id=1
+"""
+
+def run_validation(log_text):
+    """Runs validate_qc_logs on log_text and returns what it printed."""
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+        f.write(log_text)
+    try:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            validate_qc_logs(f.name, RULE_STRING)
+        return output.getvalue()
+    finally:
+        os.remove(f.name)
+
+def exit_results(report):
+    """{entry order id: result line} for each validated trade in a report."""
+    results = {}
+    for section in report.split("Validating Trade from Entry Order ID: ")[1:]:
+        order_id, _, body = section.partition("\n")
+        results[int(order_id)] = next(line for line in body.splitlines() if line.startswith("Result:"))
+    return results
+
+class TestValidateLogs(unittest.TestCase):
+    """Tests for rebuilding trades from QuantConnect log lines."""
+
+    def test_exits_attributed_by_child_orders(self):
+        """With CHILD ORDERS lines, each exit goes to the entry that placed its leg, not the oldest open trade."""
+        results = exit_results(run_validation(OVERLAPPING_LOG))
+        self.assertEqual(results, {
+            1: "Result: PASSED. Exited via StopLoss.",
+            4: "Result: PASSED. Exited via TakeProfit.",
+        })
+
+    def test_exits_fall_back_to_oldest_open_trade(self):
+        """Without CHILD ORDERS lines, exits are attributed to open trades in fill order."""
+        log_text = "".join(line + "\n" for line in OVERLAPPING_LOG.splitlines() if "CHILD ORDERS" not in line)
+        results = exit_results(run_validation(log_text))
+        self.assertEqual(results, {
+            1: "Result: PASSED. Exited via TakeProfit.",
+            4: "Result: PASSED. Exited via StopLoss.",
+        })
+
+    def test_canceled_entry(self):
+        """An entry canceled at expiry is reported as such, and fails its week."""
+        report = run_validation(
+            "2024-04-04 00:00:00 Entry order 1 submitted. Expires if not filled by 2024-04-04 08:00:00.\n"
+            "2024-04-04 08:00:00 CANCELED: Entry Order 1 expired without being filled.\n"
+        )
+        self.assertIn("[FAIL] Week 2024-W14: 1 trade(s) placed but expired without being filled", report)
+        self.assertIn("Validating Canceled Order ID: 1\n  [PASS] Order Expiry: 8:00:00", report)
+
+    def test_records_need_a_timestamp_prefix(self):
+        """Record text without the "YYYY-MM-DD HH:MM:SS " prefix, or inside other lines' text, is ignored."""
+        log_text = OVERLAPPING_LOG + "garbage line ENTRY EXECUTED: OrderID 9 filled at $1.00. TP: 2.00, SL: 0.50\n"
+        report = run_validation(log_text)
+        self.assertNotIn("Entry Order ID: 9", report)
+        self.assertEqual(set(exit_results(report)), {1, 4})
+
+    def test_empty_log(self):
+        """An empty log file produces an empty report rather than an error."""
+        report = run_validation("")
+        self.assertIn("--- Validation Report ---", report)
+        self.assertNotIn("Weekly Trade Validation", report)
+
+if __name__ == '__main__':
+    unittest.main()
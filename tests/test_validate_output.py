@@ -0,0 +1,167 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+# Add the parent directory to the path so we can import the validator modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import validate_output
+from validate_output import (
+    KIND_STOP_LOSS, KIND_TAKE_PROFIT, STATUS_CANCELED, STATUS_FILLED,
+    _categorize, _sorted_by, match_all
+)
+
+T0 = datetime(2024, 1, 4, tzinfo=timezone.utc)
+T0_EPOCH = T0.timestamp()
+
+def iso(seconds):
+    """QuantConnect-style time string, seconds after T0."""
+    return (T0 + timedelta(seconds=seconds)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+def order(order_id, tag, status, created, filled=None, updated=None, quantity=-10.0, stop=0.0, limit=0.0):
+    return str(order_id), {
+        'id': order_id, 'tag': tag, 'status': status, 'time': iso(created),
+        'lastFillTime': iso(filled) if filled is not None else None,
+        'lastUpdateTime': iso(updated) if updated is not None else None,
+        'quantity': quantity, 'stopPrice': stop, 'limitPrice': limit
+    }
+
+# One filled entry at T0+100s exiting around T0+1000s, plus the edge cases around it
+ORDERS = dict([
+    order(1, 'Entry Order | pos_id=1', 'Filled', 0, filled=100, updated=100, quantity=10.0, stop=1903.26),
+    order(2, 'TakeProfit | pos_id=1', 'Canceled', 100, limit=2083.29),
+    order(3, 'StopLoss | pos_id=1', 'Canceled', 104, stop=1882.04),       # 4s after the fill: a leg
+    order(4, 'StopLoss | pos_id=9', 'Canceled', 105, stop=1.0),           # exactly 5s after: not a leg
+    order(5, 'TakeProfit | pos_id=1', 'Canceled', 96, limit=2083.30),     # also a leg; last in order wins
+    order(6, 'StopLoss | pos_id=9', 'Canceled', 95, stop=2.0),            # exactly 5s before: not a leg
+    order(7, 'Time Limit Exit | pos_id=1', 'Filled', 1059, filled=1059),  # 59s after the exit: first in order wins
+    order(8, 'Time Limit Exit | pos_id=8', 'Filled', 1030, filled=1030),  # closer, but later in all_orders
+    order(9, 'Other', 'Filled', 1000, filled=1000, quantity=-5.0),        # wrong quantity
+    order(10, 'Other', 'Filled', 5060, filled=5060),                      # exactly 60s after the second exit
+    order(11, 'Entry Order | pos_id=2', 'Canceled', 2000, updated=2000 + 8 * 3600, quantity=10.0),
+])
+POSITIONS = {int(key): i for i, key in enumerate(ORDERS)}
+
+class TestCategorize(unittest.TestCase):
+    """Tests for the single pass that packs and sorts the orders."""
+
+    def setUp(self):
+        self.index = _categorize(ORDERS)
+
+    def test_lists_are_positions_in_all_orders_order(self):
+        """Each list holds the right orders, in all_orders order."""
+        self.assertEqual(self.index.order_ids, list(ORDERS))
+        self.assertEqual(self.index.entry_filled, [POSITIONS[1]])
+        self.assertEqual(self.index.entry_canceled, [POSITIONS[11]])
+        self.assertEqual(self.index.take_profit, [POSITIONS[2], POSITIONS[5]])
+        self.assertEqual(self.index.stop_loss, [POSITIONS[3], POSITIONS[4], POSITIONS[6]])
+        self.assertEqual(self.index.closing, [POSITIONS[i] for i in (1, 7, 8, 9, 10)])
+
+    def test_order_table(self):
+        """Times are parsed to epochs, codes assigned and missing fields left as NaN."""
+        table = self.index.order_table
+        self.assertEqual(table['time_ep'][POSITIONS[3]], T0_EPOCH + 104)
+        self.assertEqual(table['fill_ep'][POSITIONS[1]], T0_EPOCH + 100)
+        self.assertTrue(np.isnan(table['fill_ep'][POSITIONS[2]]))
+        self.assertTrue(np.isnan(table['upd_ep'][POSITIONS[3]]))
+        self.assertEqual(table['status'][POSITIONS[1]], STATUS_FILLED)
+        self.assertEqual(table['status'][POSITIONS[11]], STATUS_CANCELED)
+        self.assertEqual(table['kind'][POSITIONS[5]], KIND_TAKE_PROFIT)
+        self.assertEqual(table['kind'][POSITIONS[6]], KIND_STOP_LOSS)
+        self.assertEqual(table['limit_px'][POSITIONS[5]], 2083.30)
+        self.assertEqual(self.index.tags[POSITIONS[7]], 'Time Limit Exit | pos_id=1')
+
+    def test_sorted_by_keeps_ties_in_order(self):
+        """_sorted_by orders by the field and keeps equal values in all_orders order."""
+        eps, positions = _sorted_by(self.index.order_table, self.index.closing, 'fill_ep')
+        self.assertEqual(eps.tolist(), sorted(eps.tolist()))
+        self.assertEqual(positions.tolist(), [POSITIONS[i] for i in (1, 9, 8, 7, 10)])
+        # Most orders share a quantity of -10
+        quantities, positions = _sorted_by(self.index.order_table, range(len(ORDERS)), 'qty')
+        self.assertEqual(quantities.tolist(), [-10.0] * 8 + [-5.0] + [10.0] * 2)
+        self.assertEqual(positions.tolist(), [POSITIONS[i] for i in (2, 3, 4, 5, 6, 7, 8, 10, 9, 1, 11)])
+
+class TestMatchAll(unittest.TestCase):
+    """
+    Tests for the order-matching kernel. Every case runs against the plain Python function and,
+    when numba is installed, against the compiled one as well.
+    """
+
+    def kernels(self):
+        python_kernel = getattr(match_all, 'py_func', match_all)
+        yield 'python', python_kernel
+        if python_kernel is not match_all:
+            yield 'numba', match_all
+
+    def match(self, kernel, entry_positions, exit_offsets, closing_qty):
+        index = _categorize(ORDERS)
+        table = index.order_table
+        leg_eps, leg_pos = _sorted_by(table, sorted(index.stop_loss + index.take_profit), 'time_ep')
+        closing_eps, closing_pos = _sorted_by(table, index.closing, 'fill_ep')
+        entry_pos = np.array(entry_positions, dtype=np.int64)
+        entry_eps = np.array([table['fill_ep'][i] if i >= 0 else np.nan for i in entry_positions])
+        exit_eps = np.array([T0_EPOCH + offset for offset in exit_offsets])
+        results = kernel(entry_eps, entry_pos, exit_eps, np.array(closing_qty, dtype=np.float64),
+                         leg_eps, leg_pos, table['kind'][leg_pos],
+                         closing_eps, closing_pos, table['qty'][closing_pos])
+        return [result.tolist() for result in results]
+
+    def test_legs_use_strict_five_second_window(self):
+        """Legs exactly 5s either side of the fill are excluded; the last leg in all_orders order wins."""
+        for name, kernel in self.kernels():
+            with self.subTest(kernel=name):
+                sl_idx, tp_idx, _ = self.match(kernel, [POSITIONS[1]], [1000], [-10.0])
+                self.assertEqual(sl_idx, [POSITIONS[3]])
+                self.assertEqual(tp_idx, [POSITIONS[5]])
+
+    def test_exit_is_first_matching_fill_in_order(self):
+        """Of the fills within 60s with the closing quantity, the first in all_orders order wins."""
+        for name, kernel in self.kernels():
+            with self.subTest(kernel=name):
+                _, _, exit_idx = self.match(kernel, [POSITIONS[1]], [1000], [-10.0])
+                self.assertEqual(exit_idx, [POSITIONS[7]])
+
+    def test_exit_uses_strict_sixty_second_window_and_quantity(self):
+        """A fill exactly 60s away, or with a different quantity, is not the closing order."""
+        for name, kernel in self.kernels():
+            with self.subTest(kernel=name):
+                sl_idx, tp_idx, exit_idx = self.match(kernel, [-1, -1], [5000, 1000], [-10.0, -7.0])
+                self.assertEqual(exit_idx, [-1, -1])
+                # Trades without an entry order get no legs
+                self.assertEqual(sl_idx, [-1, -1])
+                self.assertEqual(tp_idx, [-1, -1])
+
+    def test_numba_is_used_when_installed(self):
+        """match_all is compiled exactly when numba can be imported."""
+        try:
+            import numba  # noqa: F401
+        except ImportError:
+            self.assertFalse(hasattr(match_all, 'py_func'))
+        else:
+            self.assertTrue(hasattr(match_all, 'py_func'))
+
+class TestLoadOrdersAndTrades(unittest.TestCase):
+    """Tests that streaming and whole-file parsing agree."""
+
+    def test_stream_matches_load_json(self):
+        try:
+            import ijson  # noqa: F401
+        except ImportError:
+            self.skipTest("ijson is not installed")
+        trade = {'entryTime': iso(100), 'exitTime': iso(1059), 'entryPrice': 1903.26,
+                 'exitPrice': 1910.0, 'quantity': 10.0, 'mae': 0.0}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump({'orders': ORDERS, 'totalPerformance': {'closedTrades': [trade]}, 'charts': {}}, f)
+        self.addCleanup(os.remove, f.name)
+        streamed = validate_output.load_orders_and_trades(f.name, stream=True)
+        parsed = validate_output.load_orders_and_trades(f.name, stream=False)
+        self.assertEqual(streamed[0], parsed[0])
+        self.assertEqual(streamed[1], [validate_output._project(trade, validate_output._TRADE_FIELDS)])
+
+if __name__ == '__main__':
+    unittest.main()
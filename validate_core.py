@@ -0,0 +1,71 @@
+import json
+from typing import NamedTuple
+import numpy as np
+
+try:
+    import orjson
+except ImportError:  # Optional; the standard library parser is used without it
+    orjson = None
+
+def load_json(file_path):
+    """Loads a backtest JSON file, with orjson when it is installed."""
+    with open(file_path, 'rb') as f:
+        raw = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            pass  # e.g. NaN literals, which orjson rejects; json decides whether the file is valid
+    return json.loads(raw)
+
+def bracket_prices(entry_price, direction, take_profit_price, stop_loss_price):
+    """Expected (take_profit, stop_loss) prices for an entry; direction is 1 for long, -1 for short. Works on scalars or arrays."""
+    return entry_price + direction * take_profit_price, entry_price - direction * stop_loss_price
+
+class TradeChecks(NamedTuple):
+    valid: np.ndarray             # passed every check
+    duration_bad: np.ndarray      # reported duration disagrees with entry/exit times by over a minute
+    is_long: np.ndarray
+    expected_tp_price: np.ndarray
+    tp_tolerance: np.ndarray
+    tp_bad: np.ndarray            # winner that exited away from its take profit
+    hit_time_limit: np.ndarray    # loser held for the full trade duration
+    expected_sl_price: np.ndarray
+    sl_tolerance: np.ndarray
+    sl_bad: np.ndarray            # other loser that exited away from its stop loss
+
+def check_trades(entry_price, exit_price, is_win, duration_s, expected_duration_s,
+                 take_profit_price, stop_loss_price, trade_duration_s) -> TradeChecks:
+    """Runs the closed-trade checks over whole columns of trades at once."""
+    # Check if duration matches
+    duration_bad = np.abs(duration_s - expected_duration_s) > 60  # Allow 1 minute difference
+
+    # Determine the actual trade direction based on profit/loss and price movement
+    price_movement = exit_price - entry_price
+    is_long = ((price_movement > 0) & is_win) | ((price_movement < 0) & ~is_win)
+    expected_tp_price, expected_sl_price = bracket_prices(
+        entry_price, np.where(is_long, 1.0, -1.0), take_profit_price, stop_loss_price)
+
+    # For winning trades, check if take profit was hit.
+    # Use a percentage-based tolerance for take profit (with very large tolerance due to variations)
+    tp_tolerance = np.maximum(60.0, expected_tp_price * 0.05)  # 5% or at least 60.0
+    tp_bad = is_win & (np.abs(exit_price - expected_tp_price) > tp_tolerance)
+
+    # Losing trades either hit the time limit or the stop loss.
+    # Use a percentage-based tolerance for stop loss (with larger tolerance due to slippage)
+    hit_time_limit = ~is_win & (duration_s >= trade_duration_s)
+    sl_tolerance = np.maximum(5.0, expected_sl_price * 0.03)  # 3% or at least 5.0
+    sl_bad = ~is_win & ~hit_time_limit & (np.abs(exit_price - expected_sl_price) > sl_tolerance)
+
+    return TradeChecks(
+        valid=~(duration_bad | tp_bad | sl_bad),
+        duration_bad=duration_bad,
+        is_long=is_long,
+        expected_tp_price=expected_tp_price,
+        tp_tolerance=tp_tolerance,
+        tp_bad=tp_bad,
+        hit_time_limit=hit_time_limit,
+        expected_sl_price=expected_sl_price,
+        sl_tolerance=sl_tolerance,
+        sl_bad=sl_bad
+    )
@@ -1,5 +1,47 @@
+import mmap
+import os
 import re
+from collections import deque
 from datetime import datetime, timedelta
+from typing import Optional
+
+class Trade:
+    """A filled entry and how it was closed. Slotted, as a large log holds one per trade."""
+    __slots__ = ('entry_time', 'entry_price', 'expected_tp', 'expected_sl', 'exit_time', 'exit_reason')
+
+    def __init__(self, entry_time: datetime, entry_price: float, expected_tp: float, expected_sl: float):
+        self.entry_time = entry_time
+        self.entry_price = entry_price
+        self.expected_tp = expected_tp
+        self.expected_sl = expected_sl
+        self.exit_time: Optional[datetime] = None
+        self.exit_reason: Optional[str] = None
+
+class PendingOrder:
+    """A submitted entry order and, if it expired unfilled, when it was canceled."""
+    __slots__ = ('submit_time', 'cancel_time', 'exit_reason')
+
+    def __init__(self, submit_time: datetime):
+        self.submit_time = submit_time
+        self.cancel_time: Optional[datetime] = None
+        self.exit_reason: Optional[str] = None
+
+def _iter_records(log_file_path: str, record_re: re.Pattern):
+    """Yields (timestamp, match) for every log line whose payload matches record_re."""
+    with open(log_file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return  # mmap cannot map an empty file, and there is nothing to yield anyway
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as log_bytes:
+            for line in iter(log_bytes.readline, b""):
+                # The payload starts after the fixed-width "YYYY-MM-DD HH:MM:SS " prefix
+                m = record_re.search(line, 20)
+                if m is None:
+                    continue
+                # Only lines that carry a record get their prefix checked and parsed
+                ts = line[:19]
+                if ts[4:5] != b'-' or ts[10:11] != b' ' or not line[19:20].isspace():
+                    continue
+                yield datetime.fromisoformat(ts.decode('ascii')), m
 
 def validate_qc_logs(log_file_path: str, rule_string: str) -> None:
     """
@@ -34,101 +76,103 @@ def validate_qc_logs(log_file_path: str, rule_string: str) -> None:
 
     # --- 2. Regular Expressions to Parse Log Lines ---
     # Note: QC logs use the local timezone of the backtest machine. We parse it and assume UTC.
-    log_line_re = re.compile(r"(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\s+(.*)")
-    entry_re = re.compile(r"ENTRY EXECUTED: OrderID (\d+) filled at \$([\d\.]+)\. TP: ([\d\.]+), SL: ([\d\.]+)")
-    exit_re = re.compile(r"EXIT EXECUTED: OrderID (\d+) \((StopLoss|TakeProfit)\) filled at \$([\d\.]+)")
-    time_exit_re = re.compile(r"EXIT TRIGGERED \(TIME LIMIT\): Trade from Entry Order (\d+) has expired\.")
-    cancel_re = re.compile(r"CANCELED: Entry Order (\d+) expired without being filled\.")
-    submit_re = re.compile(r"Entry order (\d+) submitted. Expires if not filled by ([\d\- \:]+).")
+    # All record types in one bytes pattern, searched in each line's payload so noise lines are
+    # never decoded. The timestamp prefix is fixed-width and sliced off rather than matched.
+    # The named record group that matched (m.lastgroup) tells us which kind of record it is.
+    record_re = re.compile(
+        rb"(?P<submit>Entry order (?P<submit_id>\d+) submitted\. Expires if not filled by (?P<expiry>[\d\- :]+)\.)"
+        rb"|(?P<entry>ENTRY EXECUTED: OrderID (?P<entry_id>\d+) filled at \$(?P<fill_price>[\d.]+)\. TP: (?P<tp_price>[\d.]+), SL: (?P<sl_price>[\d.]+))"
+        rb"|(?P<child>CHILD ORDERS: Entry (?P<child_entry_id>\d+) TP (?P<child_tp_id>\d+) SL (?P<child_sl_id>\d+))"
+        rb"|(?P<exit>EXIT EXECUTED: OrderID (?P<exit_id>\d+) \((?P<exit_reason>StopLoss|TakeProfit)\) filled at \$(?P<exit_price>[\d.]+))"
+        rb"|(?P<time_exit>EXIT TRIGGERED \(TIME LIMIT\): Trade from Entry Order (?P<time_exit_id>\d+) has expired\.)"
+        rb"|(?P<cancel>CANCELED: Entry Order (?P<cancel_id>\d+) expired without being filled\.)"
+    )
 
     # --- 3. Data Structures to Reconstruct Trades ---
-    trades = {} # {entry_order_id: {details}}
-    pending_orders = {} # {order_id: {details}}
+    trades = {} # {entry_order_id: Trade}
+    pending_orders = {} # {order_id: PendingOrder}
+    open_trades = deque() # entry_order_ids in fill order, for logs without CHILD ORDERS lines
+    child_to_entry = {} # {tp_or_sl_order_id: entry_order_id}
+    # Earliest and latest entry fills, tracked as they are parsed; unfilled orders are added later
+    start_date = None
+    end_date = None
 
 
     # --- 4. Parse the Log File ---
-    with open(log_file_path, 'r') as f:
-        for line in f:
-            match = log_line_re.match(line)
-            if not match:
-                continue
-
-            log_time_str, message = match.groups()
-            log_time = datetime.strptime(log_time_str, '%Y-%m-%d %H:%M:%S')
-
-            # Capture order submission
-            m = submit_re.search(message)
-            if m:
-                order_id, expiry_str = m.groups()
-                pending_orders[int(order_id)] = {'submit_time': log_time}
-
-            # Capture entry fill
-            m = entry_re.search(message)
-            if m:
-                order_id, fill_price, tp_price, sl_price = m.groups()
-                order_id = int(order_id)
-                trades[order_id] = {
-                    'entry_time': log_time,
-                    'entry_price': float(fill_price),
-                    'expected_tp': float(tp_price),
-                    'expected_sl': float(sl_price),
-                    'exit_time': None,
-                    'exit_reason': None
-                }
-
-            # Capture SL/TP exit
-            m = exit_re.search(message)
-            if m:
-                # Find which entry this exit belongs to
-                for entry_id, trade in trades.items():
-                    # This is a simplification; a real system would need a proper map
-                    # For one-trade-at-a-time, this is sufficient.
-                    if trade['exit_time'] is None:
-                        trade['exit_time'] = log_time
-                        trade['exit_reason'] = m.group(2)
-                        break
-
-            # Capture Time Limit exit
-            m = time_exit_re.search(message)
-            if m:
-                entry_id = int(m.group(1))
-                if entry_id in trades:
-                    trades[entry_id]['exit_time'] = log_time
-                    trades[entry_id]['exit_reason'] = 'TIME LIMIT'
-
-            # Capture Order Cancellation
-            m = cancel_re.search(message)
-            if m:
-                order_id = int(m.group(1))
-                if order_id in pending_orders:
-                    pending_orders[order_id]['cancel_time'] = log_time
-                    pending_orders[order_id]['exit_reason'] = 'CANCELED'
+    for log_time, m in _iter_records(log_file_path, record_re):
+        kind = m.lastgroup
+
+        # Capture order submission
+        if kind == 'submit':
+            pending_orders[int(m.group('submit_id'))] = PendingOrder(log_time)
+
+        # Capture entry fill
+        elif kind == 'entry':
+            order_id = int(m.group('entry_id'))
+            trades[order_id] = Trade(
+                entry_time=log_time,
+                entry_price=float(m.group('fill_price')),
+                expected_tp=float(m.group('tp_price')),
+                expected_sl=float(m.group('sl_price'))
+            )
+            open_trades.append(order_id)
+            if start_date is None or log_time < start_date:
+                start_date = log_time
+            if end_date is None or log_time > end_date:
+                end_date = log_time
+
+        # Capture the TP/SL order ids placed for an entry
+        elif kind == 'child':
+            entry_id = int(m.group('child_entry_id'))
+            child_to_entry[int(m.group('child_tp_id'))] = entry_id
+            child_to_entry[int(m.group('child_sl_id'))] = entry_id
+
+        # Capture SL/TP exit
+        elif kind == 'exit':
+            entry_id = child_to_entry.pop(int(m.group('exit_id')), None)
+            if entry_id is None:
+                # Older logs don't announce the legs, so fall back to the oldest trade still
+                # open. Trades closed since they were queued are skipped here.
+                while open_trades and trades[open_trades[0]].exit_time is not None:
+                    open_trades.popleft()
+                if open_trades:
+                    entry_id = open_trades.popleft()
+            if entry_id in trades:
+                trade = trades[entry_id]
+                trade.exit_time = log_time
+                trade.exit_reason = m.group('exit_reason').decode('ascii')
+
+        # Capture Time Limit exit
+        elif kind == 'time_exit':
+            entry_id = int(m.group('time_exit_id'))
+            if entry_id in trades:
+                trades[entry_id].exit_time = log_time
+                trades[entry_id].exit_reason = 'TIME LIMIT'
+
+        # Capture Order Cancellation
+        elif kind == 'cancel':
+            order_id = int(m.group('cancel_id'))
+            if order_id in pending_orders:
+                pending_orders[order_id].cancel_time = log_time
+                pending_orders[order_id].exit_reason = 'CANCELED'
 
     # --- 5. Validate and Print Report ---
-    print("--- Validation Report ---")
+    # Report lines are collected and written with a single print at the end
+    report = ["--- Validation Report ---"]
 
     # Group trades by week
     trades_by_week = {}
-    # Group pending orders by week
+    # Group pending orders by week (sets, so an order is only counted once per week)
     pending_by_week = {}
     # Group time-expired trades by week
     expired_by_week = {}
-    start_date = None
-    end_date = None
 
     # Process executed trades
     for order_id, trade in trades.items():
-        entry_time = trade['entry_time']
-
-        # Track the earliest and latest dates
-        if start_date is None or entry_time < start_date:
-            start_date = entry_time
-        if end_date is None or entry_time > end_date:
-            end_date = entry_time
+        entry_time = trade.entry_time
 
-        # Get the week number (ISO week)
-        year, week_num, _ = entry_time.isocalendar()
-        week_key = f"{year}-W{week_num:02d}"
+        # Get the (year, week number) ISO week; formatted only when printed
+        week_key = entry_time.isocalendar()[:2]
 
         if week_key not in trades_by_week:
             trades_by_week[week_key] = []
@@ -136,35 +180,15 @@ def validate_qc_logs(log_file_path: str, rule_string: str) -> None:
         trades_by_week[week_key].append(order_id)
 
         # If this trade expired due to time limit, add it to expired_by_week
-        if trade.get('exit_reason') == 'TIME LIMIT':
+        if trade.exit_reason == 'TIME LIMIT':
             if week_key not in expired_by_week:
                 expired_by_week[week_key] = []
             expired_by_week[week_key].append(order_id)
 
-    # Process pending orders that were canceled
-    for order_id, order in pending_orders.items():
-        if order.get('exit_reason') == 'CANCELED':
-            submit_time = order['submit_time']
-
-            # Track the earliest and latest dates
-            if start_date is None or submit_time < start_date:
-                start_date = submit_time
-            if end_date is None or submit_time > end_date:
-                end_date = submit_time
-
-            # Get the week number (ISO week)
-            year, week_num, _ = submit_time.isocalendar()
-            week_key = f"{year}-W{week_num:02d}"
-
-            if week_key not in pending_by_week:
-                pending_by_week[week_key] = []
-
-            pending_by_week[week_key].append(order_id)
-
-    # Process all submitted orders to identify those that were not filled
+    # Process submitted orders that never became trades (expired, canceled or still open)
     for order_id, order in pending_orders.items():
-        if order_id not in trades:  # Order was submitted but not filled
-            submit_time = order['submit_time']
+        if order_id not in trades or order.exit_reason == 'CANCELED':
+            submit_time = order.submit_time
 
             # Track the earliest and latest dates
             if start_date is None or submit_time < start_date:
@@ -172,101 +196,96 @@ def validate_qc_logs(log_file_path: str, rule_string: str) -> None:
             if end_date is None or submit_time > end_date:
                 end_date = submit_time
 
-            # Get the week number (ISO week)
-            year, week_num, _ = submit_time.isocalendar()
-            week_key = f"{year}-W{week_num:02d}"
+            # Get the (year, week number) ISO week
+            week_key = submit_time.isocalendar()[:2]
 
-            if week_key not in pending_by_week:
-                pending_by_week[week_key] = []
-
-            # Only add if not already in the list
-            if order_id not in pending_by_week[week_key]:
-                pending_by_week[week_key].append(order_id)
+            pending_by_week.setdefault(week_key, set()).add(order_id)
 
     # Validate that a trade is placed every week
     if start_date and end_date:
-        print("\n--- Weekly Trade Validation ---")
+        report.append("\n--- Weekly Trade Validation ---")
 
         # Generate all weeks in the date range
         current_date = start_date
         all_weeks = set()
 
         while current_date <= end_date:
-            year, week_num, _ = current_date.isocalendar()
-            week_key = f"{year}-W{week_num:02d}"
-            all_weeks.add(week_key)
+            all_weeks.add(current_date.isocalendar()[:2])
             current_date += timedelta(days=7)
 
         # Check if each week has at least one trade
         all_weeks_valid = True
         for week_key in sorted(all_weeks):
+            week_label = f"{week_key[0]}-W{week_key[1]:02d}"
             if week_key in trades_by_week:
                 trade_count = len(trades_by_week[week_key])
                 # Check if any trades in this week expired due to time limit
                 if week_key in expired_by_week:
                     expired_count = len(expired_by_week[week_key])
-                    print(f"  [PASS] Week {week_key}: {trade_count} trade(s) placed, {expired_count} expired due to time limit")
+                    report.append(f"  [PASS] Week {week_label}: {trade_count} trade(s) placed, {expired_count} expired due to time limit")
                 else:
-                    print(f"  [PASS] Week {week_key}: {trade_count} trade(s) placed")
+                    report.append(f"  [PASS] Week {week_label}: {trade_count} trade(s) placed")
             elif week_key in pending_by_week:
                 expired_count = len(pending_by_week[week_key])
-                print(f"  [FAIL] Week {week_key}: {expired_count} trade(s) placed but expired without being filled")
+                report.append(f"  [FAIL] Week {week_label}: {expired_count} trade(s) placed but expired without being filled")
                 all_weeks_valid = False
             else:
-                print(f"  [FAIL] Week {week_key}: No trades placed")
+                report.append(f"  [FAIL] Week {week_label}: No trades placed")
                 all_weeks_valid = False
 
         if all_weeks_valid:
-            print("\nWeekly Trade Validation: PASSED. A trade was placed every week.")
+            report.append("\nWeekly Trade Validation: PASSED. A trade was placed every week.")
         else:
-            print("\nWeekly Trade Validation: FAILED. Some weeks have no trades.")
+            report.append("\nWeekly Trade Validation: FAILED. Some weeks have no trades.")
 
     # Validate Filled Trades
     for order_id, trade in trades.items():
-        print(f"\nValidating Trade from Entry Order ID: {order_id}")
+        report.append(f"\nValidating Trade from Entry Order ID: {order_id}")
         is_valid = True
 
         # Check SL/TP price calculation
-        calc_tp = round(trade['entry_price'] + (take_profit_ticks / 100.0), 2)
-        calc_sl = round(trade['entry_price'] - (stop_loss_ticks / 100.0), 2)
+        calc_tp = round(trade.entry_price + (take_profit_ticks / 100.0), 2)
+        calc_sl = round(trade.entry_price - (stop_loss_ticks / 100.0), 2)
 
-        if abs(calc_tp - trade['expected_tp']) > 0.01:
-            print(f"  [FAIL] Take-Profit Price: Expected ~{calc_tp}, Logged {trade['expected_tp']}")
+        if abs(calc_tp - trade.expected_tp) > 0.01:
+            report.append(f"  [FAIL] Take-Profit Price: Expected ~{calc_tp}, Logged {trade.expected_tp}")
             is_valid = False
         else:
-            print(f"  [PASS] Take-Profit Price: ~{calc_tp}")
+            report.append(f"  [PASS] Take-Profit Price: ~{calc_tp}")
 
-        if abs(calc_sl - trade['expected_sl']) > 0.01:
-            print(f"  [FAIL] Stop-Loss Price: Expected ~{calc_sl}, Logged {trade['expected_sl']}")
+        if abs(calc_sl - trade.expected_sl) > 0.01:
+            report.append(f"  [FAIL] Stop-Loss Price: Expected ~{calc_sl}, Logged {trade.expected_sl}")
             is_valid = False
         else:
-            print(f"  [PASS] Stop-Loss Price: ~{calc_sl}")
+            report.append(f"  [PASS] Stop-Loss Price: ~{calc_sl}")
 
         # Check trade duration on time-based exits
-        if trade['exit_reason'] == 'TIME LIMIT':
-            duration = trade['exit_time'] - trade['entry_time']
+        if trade.exit_reason == 'TIME LIMIT':
+            duration = trade.exit_time - trade.entry_time
             expected_duration = timedelta(hours=trade_duration_hours)
             # Allow a small tolerance (e.g., 1 minute)
             if abs(duration - expected_duration) > timedelta(minutes=1):
-                print(f"  [FAIL] Trade Duration: Expected {expected_duration}, Actual {duration}")
+                report.append(f"  [FAIL] Trade Duration: Expected {expected_duration}, Actual {duration}")
                 is_valid = False
             else:
-                print(f"  [PASS] Trade Duration: {duration}")
+                report.append(f"  [PASS] Trade Duration: {duration}")
 
         if is_valid:
-            print(f"Result: PASSED. Exited via {trade['exit_reason']}.")
+            report.append(f"Result: PASSED. Exited via {trade.exit_reason}.")
 
     # Validate Canceled Orders
     for order_id, order in pending_orders.items():
-        if order.get('exit_reason') == 'CANCELED':
-            print(f"\nValidating Canceled Order ID: {order_id}")
-            duration = order['cancel_time'] - order['submit_time']
+        if order.exit_reason == 'CANCELED':
+            report.append(f"\nValidating Canceled Order ID: {order_id}")
+            duration = order.cancel_time - order.submit_time
             expected_duration = timedelta(hours=order_expiry_hours)
             # Allow a small tolerance
             if abs(duration - expected_duration) > timedelta(minutes=1):
-                print(f"  [FAIL] Order Expiry: Expected {expected_duration}, Actual {duration}")
+                report.append(f"  [FAIL] Order Expiry: Expected {expected_duration}, Actual {duration}")
             else:
-                print(f"  [PASS] Order Expiry: {duration}")
+                report.append(f"  [PASS] Order Expiry: {duration}")
+
+    print("\n".join(report))
 
 if __name__ == '__main__':
     # --- CONFIGURATION ---
@@ -1,5 +1,21 @@
 import json
+import os
 from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import NamedTuple
+import numpy as np
+from validate_core import bracket_prices, load_json
+
+try:
+    from numba import njit
+except ImportError:  # Optional; without it match_all runs as plain Python
+    def njit(**_):
+        return lambda func: func
+
+try:
+    import ijson
+except ImportError:  # Optional; without it the whole document is parsed into memory
+    ijson = None
 
 # --- Configuration ---
 # Define the trading rules based on the algorithm's rule_string:
@@ -14,66 +30,178 @@ ORDER_EXPIRY_HOURS = 8
 PRICE_TOLERANCE = 0.01  # e.g., 1 cent
 TIME_TOLERANCE_SECONDS = 60 # e.g., 1 minute for exit checks
 
+# The only order and closed-trade fields validate_backtest reads
+_ORDER_FIELDS = ('id', 'status', 'tag', 'time', 'lastFillTime', 'lastUpdateTime', 'stopPrice', 'limitPrice', 'quantity')
+_TRADE_FIELDS = ('entryTime', 'exitTime', 'entryPrice', 'exitPrice', 'quantity')
+
+def _project(item, fields):
+    """The given fields of an order or trade dict, skipping any it lacks."""
+    return {key: item[key] for key in fields if key in item}
+
+# Files at least this big are streamed by default; smaller ones parse faster in one go with load_json
+STREAM_MIN_BYTES = 256 * 1024 * 1024
+
+def load_orders_and_trades(file_path, stream=None):
+    """
+    Returns (all_orders, closed_trades) from a backtest JSON file. When streaming (stream=True,
+    or by default for files of STREAM_MIN_BYTES or more with ijson installed) the file is read
+    one order / trade at a time and only the fields used here are kept, so the rest of the
+    document (charts, statistics, ...) is never held in memory, at some cost in parse time.
+    """
+    if stream is None:
+        stream = ijson is not None and os.path.getsize(file_path) >= STREAM_MIN_BYTES
+    if not stream:
+        data = load_json(file_path)
+    elif ijson is None:
+        raise ImportError("Streaming a backtest file requires ijson")
+    else:
+        try:
+            with open(file_path, 'rb') as f:
+                all_orders = {order_id: _project(order, _ORDER_FIELDS)
+                              for order_id, order in ijson.kvitems(f, 'orders', use_float=True)}
+            with open(file_path, 'rb') as f:
+                closed_trades = [_project(trade, _TRADE_FIELDS)
+                                 for trade in ijson.items(f, 'totalPerformance.closedTrades.item', use_float=True)]
+            return all_orders, closed_trades
+        except ijson.JSONError:
+            # e.g. NaN literals, which orjson rejects too; json decides whether the file is valid
+            with open(file_path, 'rb') as f:
+                data = json.load(f)
+    return data.get('orders', {}), data.get('totalPerformance', {}).get('closedTrades', [])
+
+@lru_cache(maxsize=None)
 def parse_qc_datetime(dt_string: str) -> datetime:
-    """Parses QuantConnect's datetime string format."""
+    """Parses QuantConnect's datetime string format. Each distinct string is parsed once."""
     # Handles both 'Z' and timezone offsets like '-04:00'
     if dt_string.endswith('Z'):
         return datetime.fromisoformat(dt_string.replace('Z', '+00:00'))
     return datetime.fromisoformat(dt_string)
 
-def find_orders_for_trade(entry_order, all_orders):
+@lru_cache(maxsize=None)
+def _epoch(dt_string: str) -> float:
+    """Seconds since the Unix epoch for a QuantConnect datetime string, so windows are plain subtraction."""
+    return parse_qc_datetime(dt_string).timestamp()
+
+# Order kinds, worked out from the tag once per order instead of substring-searched on every lookup
+KIND_OTHER, KIND_ENTRY, KIND_TAKE_PROFIT, KIND_STOP_LOSS, KIND_TIME_LIMIT = range(5)
+
+def _tag_kind(tag: str) -> int:
+    """Classifies an order by the tag the algorithm gave it."""
+    if 'Entry Order' in tag:
+        return KIND_ENTRY
+    if 'TakeProfit' in tag:
+        return KIND_TAKE_PROFIT
+    if 'StopLoss' in tag:
+        return KIND_STOP_LOSS
+    if 'Time Limit Exit' in tag:
+        return KIND_TIME_LIMIT
+    return KIND_OTHER
+
+# Order statuses the checks look at
+STATUS_OTHER, STATUS_FILLED, STATUS_CANCELED = range(3)
+_STATUS_CODES = {'Filled': STATUS_FILLED, 'Canceled': STATUS_CANCELED}
+
+# One row per order in all_orders order: STATUS_* and KIND_* codes, creation / last fill /
+# last update epochs, stop and limit prices and quantity. Missing times and prices are NaN.
+ORDER_DTYPE = np.dtype([('status', 'i1'), ('kind', 'i1'), ('time_ep', 'f8'), ('fill_ep', 'f8'),
+                        ('upd_ep', 'f8'), ('stop_px', 'f8'), ('limit_px', 'f8'), ('qty', 'f8')])
+
+class OrderIndex(NamedTuple):
+    order_ids: list               # all_orders keys; tags and order_table rows are parallel to them
+    tags: list
+    order_table: np.ndarray       # ORDER_DTYPE rows
+    entry_filled: list            # the lists hold positions, in all_orders order
+    stop_loss: list
+    take_profit: list
+    closing: list                 # every Filled order, any of which may have closed a trade
+    entry_canceled: list
+
+def _categorize(all_orders) -> OrderIndex:
+    """Packs every order into an ORDER_DTYPE row and sorts it into the OrderIndex lists, in one walk over all_orders."""
+    order_ids, tags, rows = [], [], []
+    entry_filled, stop_loss, take_profit, closing, entry_canceled = [], [], [], [], []
+    for i, (order_id, order) in enumerate(all_orders.items()):
+        status = _STATUS_CODES.get(order.get('status'), STATUS_OTHER)
+        kind = _tag_kind(order.get('tag', ''))
+        last_fill = _epoch(order['lastFillTime']) if order.get('lastFillTime') else None
+        last_update = _epoch(order['lastUpdateTime']) if order.get('lastUpdateTime') else None
+        order_ids.append(order_id)
+        tags.append(order.get('tag', 'Unknown'))
+        rows.append((status, kind, _epoch(order['time']), last_fill, last_update,
+                     order.get('stopPrice'), order.get('limitPrice'), order.get('quantity')))
+
+        if status == STATUS_FILLED and last_fill is not None:
+            closing.append(i)
+            if kind == KIND_ENTRY:
+                entry_filled.append(i)
+        elif status == STATUS_CANCELED and kind == KIND_ENTRY:
+            entry_canceled.append(i)
+        if kind == KIND_TAKE_PROFIT:
+            take_profit.append(i)
+        elif kind == KIND_STOP_LOSS:
+            stop_loss.append(i)
+
+    order_table = np.array(rows, dtype=ORDER_DTYPE)  # None becomes NaN
+    return OrderIndex(order_ids, tags, order_table, entry_filled, stop_loss, take_profit, closing, entry_canceled)
+
+def _sorted_by(order_table, positions, field):
+    """(values, positions) of the given orders sorted by order_table[field], ties kept in all_orders order."""
+    positions = np.array(positions, dtype=np.int64)
+    positions = positions[np.argsort(order_table[field][positions], kind='stable')]
+    return order_table[field][positions], positions
+
+@njit(cache=True)
+def match_all(entry_eps, entry_pos, exit_eps, closing_qty,
+              created_eps, created_pos, created_kinds, fill_eps, fill_pos, fill_qty):
     """
-    Finds the associated SL, TP, and closing orders for a given entry order.
-    This is inferred by looking at orders created shortly after the entry fill.
+    Matches every trade to its bracket legs and closing order in one pass over the sorted arrays.
+    entry_eps / entry_pos are the fill epoch and position of each trade's entry order (NaN / -1
+    when it has none), exit_eps and closing_qty its exit epoch and the quantity that closes it.
+    Returns (sl_idx, tp_idx, exit_idx), positions in all_orders order or -1 where nothing matched.
     """
-    entry_fill_time = parse_qc_datetime(entry_order['lastFillTime'])
-    sl_order, tp_order, closing_order = None, None, None
-
-    for order_id, order in all_orders.items():
-        if order['id'] == entry_order['id']:
-            continue
-
-        order_time = parse_qc_datetime(order['time'])
-
-        # Check for orders created around the same time as the entry fill
-        if abs((order_time - entry_fill_time).total_seconds()) < 5:
-            tag = order.get('tag', '')
-            if 'TakeProfit' in tag:
-                tp_order = order
-            elif 'StopLoss' in tag:
-                sl_order = order
-
-    return sl_order, tp_order
-
-
-def get_exit_reason(trade, all_orders):
-    """Determines the reason a trade was closed by finding the closing order."""
-    exit_time = parse_qc_datetime(trade['exitTime'])
-
-    for order_id, order in all_orders.items():
-        if order['status'] == 'Filled' and order['lastFillTime']:
-            fill_time = parse_qc_datetime(order['lastFillTime'])
-            if abs((fill_time - exit_time).total_seconds()) < TIME_TOLERANCE_SECONDS:
-                # Check if the order closes the position
-                if float(order['quantity']) == -float(trade['quantity']):
-                    return order.get('tag', 'Unknown')
-    return 'Unknown'
-
-
-def validate_backtest(file_path: str):
+    n = entry_eps.shape[0]
+    sl_idx = np.full(n, -1, np.int64)
+    tp_idx = np.full(n, -1, np.int64)
+    exit_idx = np.full(n, -1, np.int64)
+    for t in range(n):
+        # The legs are the orders created less than 5 seconds either side of the entry fill;
+        # if there are several, the last in all_orders order wins as it always has
+        entry_ep = entry_eps[t]
+        if entry_pos[t] >= 0:
+            lo = np.searchsorted(created_eps, entry_ep - 5, side='right')
+            hi = np.searchsorted(created_eps, entry_ep + 5, side='left')
+            for j in range(lo, hi):
+                pos = created_pos[j]
+                if pos == entry_pos[t]:
+                    continue
+                kind = created_kinds[j]
+                if kind == KIND_TAKE_PROFIT and pos > tp_idx[t]:
+                    tp_idx[t] = pos
+                elif kind == KIND_STOP_LOSS and pos > sl_idx[t]:
+                    sl_idx[t] = pos
+
+        # The closing order is the first Filled one near the exit whose quantity exactly offsets the trade's
+        exit_ep = exit_eps[t]
+        lo = np.searchsorted(fill_eps, exit_ep - TIME_TOLERANCE_SECONDS, side='right')
+        hi = np.searchsorted(fill_eps, exit_ep + TIME_TOLERANCE_SECONDS, side='left')
+        for j in range(lo, hi):
+            pos = fill_pos[j]
+            if fill_qty[j] == closing_qty[t] and (exit_idx[t] < 0 or pos < exit_idx[t]):
+                exit_idx[t] = pos
+    return sl_idx, tp_idx, exit_idx
+
+
+def validate_backtest(file_path: str, stream=None):
     """
     Main function to load, parse, and validate the backtest results.
+    stream is passed to load_orders_and_trades.
     """
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
+        all_orders, closed_trades = load_orders_and_trades(file_path, stream=stream)
     except (FileNotFoundError, json.JSONDecodeError) as e:
         print(f"Error loading or parsing JSON file: {e}")
         return
 
-    all_orders = data.get('orders', {})
-    closed_trades = data.get('totalPerformance', {}).get('closedTrades', [])
-
     if not all_orders or not closed_trades:
         print("Could not find 'orders' or 'totalPerformance.closedTrades' in the JSON file.")
         return
@@ -88,10 +216,38 @@ def validate_backtest(file_path: str):
     print(f"Order Expiry:      {ORDER_EXPIRY_HOURS} hours")
     print("-" * 35, "\n")
 
+    # Parse and categorize every order in one pass; each trade then only looks at orders a few seconds away
+    index = _categorize(all_orders)
+    order_table = index.order_table
+    fill_ep = order_table['fill_ep']
+    # Filled entry orders sorted by fill time, so each trade's entry is a binary search away
+    entry_fill_eps, entry_fill_pos = _sorted_by(order_table, index.entry_filled, 'fill_ep')
+    # Bracket legs by creation time and closing candidates by fill time, for match_all
+    leg_eps, leg_pos = _sorted_by(order_table, sorted(index.stop_loss + index.take_profit), 'time_ep')
+    by_created = (leg_eps, leg_pos, order_table['kind'][leg_pos])
+    closing_eps, closing_pos = _sorted_by(order_table, index.closing, 'fill_ep')
+    by_fill = (closing_eps, closing_pos, order_table['qty'][closing_pos])
+
+    # Entry orders filled less than 2 seconds either side of each trade's entry
+    trade_entry_eps = np.array([_epoch(trade['entryTime']) for trade in closed_trades], dtype=np.float64)
+    window_lo = np.searchsorted(entry_fill_eps, trade_entry_eps - 2, side='right').tolist()
+    window_hi = np.searchsorted(entry_fill_eps, trade_entry_eps + 2, side='left').tolist()
+    # More than one is unlikely, but the first in all_orders order wins as it always has
+    entry_pos = [int(entry_fill_pos[lo:hi].min()) if lo < hi else -1 for lo, hi in zip(window_lo, window_hi)]
+    entry_eps = [fill_ep[i] if i >= 0 else np.nan for i in entry_pos]
+    exit_eps = [_epoch(trade['exitTime']) for trade in closed_trades]
+    # The closing order's quantity exactly offsets the trade's
+    closing_qty = [-float(trade['quantity']) for trade in closed_trades]
+    sl_idx, tp_idx, exit_idx = match_all(
+        np.array(entry_eps, dtype=np.float64), np.array(entry_pos, dtype=np.int64),
+        np.array(exit_eps, dtype=np.float64), np.array(closing_qty, dtype=np.float64),
+        *by_created, *by_fill)
+    sl_idx, tp_idx, exit_idx = sl_idx.tolist(), tp_idx.tolist(), exit_idx.tolist()
+
     # --- 1. Validate Closed Trades ---
     print("--- Closed Trade Validation ---")
     trade_count = 0
-    for trade in closed_trades:
+    for t, trade in enumerate(closed_trades):
         trade_count += 1
         print(f"\nValidating Trade #{trade_count} (Entry Time: {trade['entryTime']})")
 
@@ -99,43 +255,30 @@ def validate_backtest(file_path: str):
         exit_price = float(trade['exitPrice'])
         direction = 1 if float(trade['quantity']) > 0 else -1
 
-        entry_order = None
-        for order_id, order in all_orders.items():
-            if order.get('status') == 'Filled' and 'Entry Order' in order.get('tag', ''):
-                if order.get('lastFillTime'):
-                    fill_time = parse_qc_datetime(order['lastFillTime'])
-                    trade_entry_time = parse_qc_datetime(trade['entryTime'])
-                    if abs((fill_time - trade_entry_time).total_seconds()) < 2:
-                        entry_order = order
-                        break
-
-        if not entry_order:
+        if entry_pos[t] < 0:
             print("  [FAIL] Could not find matching entry order for this trade.")
             continue
 
-        sl_order, tp_order = find_orders_for_trade(entry_order, all_orders)
-        if not sl_order or not tp_order:
+        if sl_idx[t] < 0 or tp_idx[t] < 0:
             print("  [FAIL] Could not find associated StopLoss or TakeProfit orders.")
             continue
 
-        expected_sl_price = entry_price - direction * (STOP_LOSS_TICKS / 100.0)
-        actual_sl_price = float(sl_order['stopPrice'])
+        expected_tp_price, expected_sl_price = bracket_prices(
+            entry_price, direction, TAKE_PROFIT_TICKS / 100.0, STOP_LOSS_TICKS / 100.0)
+        actual_sl_price = float(order_table['stop_px'][sl_idx[t]])
         if abs(expected_sl_price - actual_sl_price) < PRICE_TOLERANCE:
             print(f"  [PASS] Stop-Loss price correctly set to ~${actual_sl_price:.2f}")
         else:
             print(f"  [FAIL] Stop-Loss: Expected ~${expected_sl_price:.2f}, but was set to ${actual_sl_price:.2f}")
 
-        expected_tp_price = entry_price + direction * (TAKE_PROFIT_TICKS / 100.0)
-        actual_tp_price = float(tp_order['limitPrice'])
+        actual_tp_price = float(order_table['limit_px'][tp_idx[t]])
         if abs(expected_tp_price - actual_tp_price) < PRICE_TOLERANCE:
             print(f"  [PASS] Take-Profit price correctly set to ~${actual_tp_price:.2f}")
         else:
             print(f"  [FAIL] Take-Profit: Expected ~${expected_tp_price:.2f}, but was set to ${actual_tp_price:.2f}")
 
-        exit_reason = get_exit_reason(trade, all_orders)
-        entry_time = parse_qc_datetime(trade['entryTime'])
-        exit_time = parse_qc_datetime(trade['exitTime'])
-        actual_duration_hours = (exit_time - entry_time).total_seconds() / 3600.0
+        exit_reason = index.tags[exit_idx[t]] if exit_idx[t] >= 0 else 'Unknown'
+        actual_duration_hours = (exit_eps[t] - trade_entry_eps[t]) / 3600.0
 
         if "StopLoss" in exit_reason:
             print(f"  [INFO] Exited via StopLoss.")
@@ -153,17 +296,14 @@ def validate_backtest(file_path: str):
     print("\n--- Expired Order Validation ---")
     expired_count = 0
     other_canceled_count = 0
-    for order_id, order in all_orders.items():
-        if 'Entry Order' in order.get('tag', '') and order.get('status') == 'Canceled':
-            created_time = parse_qc_datetime(order['time'])
-            cancelled_time = parse_qc_datetime(order['lastUpdateTime'])
-            duration_hours = (cancelled_time - created_time).total_seconds() / 3600.0
-
-            if abs(duration_hours - ORDER_EXPIRY_HOURS) < 0.1:  # 6-minute tolerance
-                print(f"  [PASS] Entry Order {order_id} correctly expired after ~{duration_hours:.2f} hours.")
-                expired_count += 1
-            else:
-                other_canceled_count +=1
+    upd_ep, time_ep = order_table['upd_ep'], order_table['time_ep']
+    for i in index.entry_canceled:
+        duration_hours = (upd_ep[i] - time_ep[i]) / 3600.0
+        if abs(duration_hours - ORDER_EXPIRY_HOURS) < 0.1:  # 6-minute tolerance
+            print(f"  [PASS] Entry Order {index.order_ids[i]} correctly expired after ~{duration_hours:.2f} hours.")
+            expired_count += 1
+        else:
+            other_canceled_count +=1
 
     if expired_count == 0:
         print("  [INFO] No orders found that were canceled due to expiry.")
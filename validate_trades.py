@@ -1,19 +1,30 @@
-import json
+import re
 import sys
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 import argparse
+import numpy as np
+from validate_core import check_trades, load_json
 
-def parse_duration(duration_str):
-    """Parse duration string into a timedelta object."""
-    if "." in duration_str:  # Format: "D.HH:MM:SS"
-        days_part, time_part = duration_str.split(".")
-        days = int(days_part)
-        hours, minutes, seconds = map(int, time_part.split(":"))
-    else:  # Format: "HH:MM:SS"
-        days = 0
-        hours, minutes, seconds = map(int, duration_str.split(":"))
+@lru_cache(maxsize=None)
+def trade_epoch(time_str):
+    """Parse a closed trade's "YYYY-MM-DDTHH:MM:SSZ" time into int UTC epoch seconds, once per distinct string."""
+    if not time_str.endswith("Z"):
+        raise ValueError(f"Unrecognised trade time '{time_str}'")
+    parsed = datetime.fromisoformat(time_str[:-1])
+    return int(parsed.replace(tzinfo=timezone.utc).timestamp())
+
+# "D.HH:MM:SS" or "HH:MM:SS"
+_DURATION_RE = re.compile(r"(?:(\d+)\.)?(\d+):(\d+):(\d+)")
 
-    return timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+@lru_cache(maxsize=None)
+def parse_duration(duration_str):
+    """Parse duration string into a whole number of seconds."""
+    m = _DURATION_RE.fullmatch(duration_str)
+    if m is None:
+        raise ValueError(f"Unrecognised duration '{duration_str}'")
+    days, hours, minutes, seconds = m.groups()
+    return int(days or 0) * 86400 + int(hours) * 3600 + int(minutes) * 60 + int(seconds)
 
 def validate_trades(json_file, rule_string=None, period=None, verbose=False):
     """
@@ -53,9 +64,9 @@ def validate_trades(json_file, rule_string=None, period=None, verbose=False):
         entry_offset_price = abs(entry_offset_ticks) / 100.0
         is_buy_stop = entry_offset_ticks > 0
 
-        # Convert hours to timedelta
-        trade_duration = timedelta(hours=trade_duration_hours)
-        order_expiry = timedelta(hours=order_expiry_hours)
+        # Convert hours to seconds
+        trade_duration_s = trade_duration_hours * 3600
+        order_expiry_s = order_expiry_hours * 3600
 
     except Exception as e:
         print(f"Failed to parse rule_string. Error: {e}")
@@ -63,8 +74,7 @@ def validate_trades(json_file, rule_string=None, period=None, verbose=False):
 
     # Load JSON file
     try:
-        with open(json_file, 'r') as f:
-            data = json.load(f)
+        data = load_json(json_file)
     except Exception as e:
         print(f"Failed to load JSON file. Error: {e}")
         return False
@@ -83,11 +93,13 @@ def validate_trades(json_file, rule_string=None, period=None, verbose=False):
                 "stats": data["totalPerformance"].get("tradeStatistics", {})
             }
 
-    # Check for period-level closedTrades arrays
-    for period_key, period_data in data.get("rollingWindow", {}).items():
-        if period and period != period_key:
-            continue
-
+    # Check for period-level closedTrades arrays, looking only the requested period up if there is one
+    rolling_window = data.get("rollingWindow", {})
+    if period:
+        rolling_items = [(period, rolling_window[period])] if period in rolling_window else []
+    else:
+        rolling_items = rolling_window.items()
+    for period_key, period_data in rolling_items:
         if "closedTrades" in period_data and period_data["closedTrades"]:
             period_trades = period_data["closedTrades"]
             all_trades.extend(period_trades)
@@ -105,8 +117,8 @@ def validate_trades(json_file, rule_string=None, period=None, verbose=False):
     print(f"  - Stop loss: {stop_loss_price:.2f}")
     print(f"  - Take profit: {take_profit_price:.2f}")
     print(f"  - Entry offset: {entry_offset_price:.2f} ({'buy stop' if is_buy_stop else 'sell limit'})")
-    print(f"  - Trade duration: {trade_duration}")
-    print(f"  - Order expiry: {order_expiry}")
+    print(f"  - Trade duration: {timedelta(seconds=trade_duration_s)}")
+    print(f"  - Order expiry: {timedelta(seconds=order_expiry_s)}")
 
     validation_results = {
         "total_trades": len(all_trades),
@@ -115,101 +127,71 @@ def validate_trades(json_file, rule_string=None, period=None, verbose=False):
         "errors": []
     }
 
+    # Per-period output, --verbose trade details included, is collected and printed in one go
+    report = []
+    errors = []
     for period_key, period_info in periods_data.items():
-        print(f"\n=== Period: {period_key} ===")
+        report.append(f"\n=== Period: {period_key} ===")
         period_trades = period_info["trades"]
 
-        for i, trade in enumerate(period_trades):
+        # One column per field, so each check below runs over the whole period at once
+        entry_price = np.array([trade['entryPrice'] for trade in period_trades], dtype=float)
+        exit_price = np.array([trade['exitPrice'] for trade in period_trades], dtype=float)
+        is_win = np.array([bool(trade['isWin']) for trade in period_trades])
+        actual_duration_s = np.array([trade_epoch(trade['exitTime']) - trade_epoch(trade['entryTime']) for trade in period_trades], dtype=np.int64)
+        expected_duration_s = np.array([parse_duration(trade['duration']) for trade in period_trades], dtype=np.int64)
+
+        checks = check_trades(entry_price, exit_price, is_win, actual_duration_s, expected_duration_s,
+                              take_profit_price, stop_loss_price, trade_duration_s)
+        trade_bad = ~checks.valid
+        invalid_count = int(np.count_nonzero(trade_bad))
+        validation_results["valid_trades"] += len(period_trades) - invalid_count
+        validation_results["invalid_trades"] += invalid_count
+
+        # Messages are only formatted for failed trades, unless every trade is being reported
+        for i in (range(len(period_trades)) if verbose else np.flatnonzero(trade_bad).tolist()):
+            trade = period_trades[i]
             trade_num = i + 1
 
             if verbose:
-                print(f"\nValidating trade {trade_num}:")
-                print(f"  Entry: {trade['entryTime']} at {trade['entryPrice']}")
-                print(f"  Exit: {trade['exitTime']} at {trade['exitPrice']}")
-                print(f"  P/L: {trade['profitLoss']}")
-                print(f"  Duration: {trade['duration']}")
-
-            # Parse entry and exit times
-            entry_time = datetime.strptime(trade['entryTime'], "%Y-%m-%dT%H:%M:%SZ")
-            exit_time = datetime.strptime(trade['exitTime'], "%Y-%m-%dT%H:%M:%SZ")
-
-            # Determine trade exit reason
-            trade_valid = True
-
-            # Calculate actual duration
-            actual_duration = exit_time - entry_time
-            expected_duration = parse_duration(trade['duration'])
-
-            # Check if duration matches
-            if abs((actual_duration - expected_duration).total_seconds()) > 60:  # Allow 1 minute difference
-                error = f"Trade {period_key}:{trade_num}: Duration mismatch. Expected {actual_duration}, got {expected_duration}"
-                validation_results["errors"].append(error)
-                trade_valid = False
+                report.append(f"\nValidating trade {trade_num}:")
+                report.append(f"  Entry: {trade['entryTime']} at {trade['entryPrice']}")
+                report.append(f"  Exit: {trade['exitTime']} at {trade['exitPrice']}")
+                report.append(f"  P/L: {trade['profitLoss']}")
+                report.append(f"  Duration: {trade['duration']}")
+
+            if checks.duration_bad[i]:
+                error = f"Trade {period_key}:{trade_num}: Duration mismatch. Expected {timedelta(seconds=int(actual_duration_s[i]))}, got {timedelta(seconds=int(expected_duration_s[i]))}"
+                errors.append(error)
                 if verbose:
-                    print(f"  ERROR: {error}")
-
-            # Determine the actual trade direction based on profit/loss and price movement
-            price_movement = trade['exitPrice'] - trade['entryPrice']
-            is_long = (price_movement > 0 and trade['isWin']) or (price_movement < 0 and not trade['isWin'])
+                    report.append(f"  ERROR: {error}")
 
             if verbose:
-                print(f"  Trade appears to be {'LONG' if is_long else 'SHORT'}")
-
-            if trade['isWin']:
-                # For winning trades, check if take profit was hit
-                if is_long:
-                    # Long trade: TP is above entry
-                    expected_tp_price = trade['entryPrice'] + take_profit_price
-                else:
-                    # Short trade: TP is below entry
-                    expected_tp_price = trade['entryPrice'] - take_profit_price
-
-                price_diff = abs(trade['exitPrice'] - expected_tp_price)
-
-                # Use a percentage-based tolerance for take profit (with very large tolerance due to variations)
-                tolerance = max(60.0, expected_tp_price * 0.05)  # 5% or at least 60.0
-
-                if price_diff > tolerance:
-                    error = f"Trade {period_key}:{trade_num}: Take profit price mismatch. Expected around {expected_tp_price:.2f}, got {trade['exitPrice']:.2f}"
-                    validation_results["errors"].append(error)
-                    trade_valid = False
+                report.append(f"  Trade appears to be {'LONG' if checks.is_long[i] else 'SHORT'}")
+
+            if is_win[i]:
+                if checks.tp_bad[i]:
+                    error = f"Trade {period_key}:{trade_num}: Take profit price mismatch. Expected around {checks.expected_tp_price[i]:.2f}, got {trade['exitPrice']:.2f}"
+                    errors.append(error)
                     if verbose:
-                        print(f"  ERROR: {error}")
+                        report.append(f"  ERROR: {error}")
                 elif verbose:
-                    print(f"  VALID: Take profit hit at {trade['exitPrice']:.2f} (within tolerance of {tolerance:.2f})")
+                    report.append(f"  VALID: Take profit hit at {trade['exitPrice']:.2f} (within tolerance of {checks.tp_tolerance[i]:.2f})")
 
-            elif actual_duration >= trade_duration:
-                # For losing trades that hit the time limit
+            elif checks.hit_time_limit[i]:
                 if verbose:
-                    print(f"  VALID: Trade hit time limit: {actual_duration} >= {trade_duration}")
-
-            else:
-                # For losing trades that hit stop loss
-                if is_long:
-                    # Long trade: SL is below entry
-                    expected_sl_price = trade['entryPrice'] - stop_loss_price
-                else:
-                    # Short trade: SL is above entry
-                    expected_sl_price = trade['entryPrice'] + stop_loss_price
-
-                price_diff = abs(trade['exitPrice'] - expected_sl_price)
-
-                # Use a percentage-based tolerance for stop loss (with larger tolerance due to slippage)
-                tolerance = max(5.0, expected_sl_price * 0.03)  # 3% or at least 5.0
-
-                if price_diff > tolerance:
-                    error = f"Trade {period_key}:{trade_num}: Stop loss price mismatch. Expected around {expected_sl_price:.2f}, got {trade['exitPrice']:.2f}"
-                    validation_results["errors"].append(error)
-                    trade_valid = False
-                    if verbose:
-                        print(f"  ERROR: {error}")
-                elif verbose:
-                    print(f"  VALID: Stop loss hit at {trade['exitPrice']:.2f} (within tolerance of {tolerance:.2f})")
+                    report.append(f"  VALID: Trade hit time limit: {timedelta(seconds=int(actual_duration_s[i]))} >= {timedelta(seconds=trade_duration_s)}")
+
+            elif checks.sl_bad[i]:
+                error = f"Trade {period_key}:{trade_num}: Stop loss price mismatch. Expected around {checks.expected_sl_price[i]:.2f}, got {trade['exitPrice']:.2f}"
+                errors.append(error)
+                if verbose:
+                    report.append(f"  ERROR: {error}")
+            elif verbose:
+                report.append(f"  VALID: Stop loss hit at {trade['exitPrice']:.2f} (within tolerance of {checks.sl_tolerance[i]:.2f})")
 
-            if trade_valid:
-                validation_results["valid_trades"] += 1
-            else:
-                validation_results["invalid_trades"] += 1
+    validation_results["errors"].extend(errors)
+    print("\n".join(report))
 
     # Print validation summary
     print("\n=== Validation Summary ===")
@@ -219,8 +201,7 @@ def validate_trades(json_file, rule_string=None, period=None, verbose=False):
 
     if validation_results["errors"]:
         print("\nValidation errors:")
-        for error in validation_results["errors"]:
-            print(f"  - {error}")
+        print("\n".join(f"  - {error}" for error in validation_results["errors"]))
         return False
     else:
         print("\nAll trades validated successfully!")